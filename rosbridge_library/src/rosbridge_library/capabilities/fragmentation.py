@@ -73,6 +73,10 @@ class Fragmentation(Capability):
         if serialized is None:
             return []
 
+        if type(serialized) is bytes:
+            # JSON encoded as utf-8 bytes (e.g. by orjson), fragment it as text
+            serialized = serialized.decode("utf-8")
+
         message_length = len(serialized)
         if message_length <= fragment_size:
             return [message]
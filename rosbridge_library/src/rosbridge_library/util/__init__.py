@@ -1,11 +1,15 @@
-# try to import json-lib: 1st try ujson, 2nd try simplejson, else import standard Python json
+# try to import json-lib: 1st try orjson (for dumps only), 2nd try ujson, 3rd try simplejson, else import standard Python json
+# note: orjson is wrapped by orjson_compat, whose dumps returns utf-8 encoded bytes rather than str
 try:
-    import ujson as json
+    from rosbridge_library.util import orjson_compat as json
 except ImportError:
     try:
-        import simplejson as json
+        import ujson as json
     except ImportError:
-        import json  # noqa: F401
+        try:
+            import simplejson as json
+        except ImportError:
+            import json  # noqa: F401
 
 import bson
 
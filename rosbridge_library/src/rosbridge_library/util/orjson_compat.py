@@ -0,0 +1,30 @@
+"""orjson behind the subset of the json module interface used by rosbridge.
+
+orjson.dumps returns utf-8 encoded bytes and, by default, rejects numpy values
+and subclasses of float and int. rclpy exposes fixed-size numeric arrays as
+numpy arrays, so those are serialized here as well.
+
+Only dumps uses orjson: orjson.loads rejects the NaN and Infinity literals that
+clients commonly send, so loads comes from the next available json library.
+"""
+import orjson
+
+try:
+    from ujson import loads  # noqa: F401
+except ImportError:
+    try:
+        from simplejson import loads  # noqa: F401
+    except ImportError:
+        from json import loads  # noqa: F401
+
+
+def _default(obj):
+    if isinstance(obj, float):
+        return float(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
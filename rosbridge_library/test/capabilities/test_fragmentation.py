@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import unittest
+from json import dumps
+
+import rclpy
+from rclpy.node import Node
+from rosbridge_library.capabilities.fragmentation import Fragmentation
+from rosbridge_library.protocol import Protocol
+
+
+class TestFragmentation(unittest.TestCase):
+    def setUp(self):
+        rclpy.init()
+        self.node = Node("test_fragmentation")
+
+    def tearDown(self):
+        self.node.destroy_node()
+        rclpy.shutdown()
+
+    def test_fragment_bytes(self):
+        # JSON encoders such as orjson serialize to utf-8 bytes
+        proto = Protocol("test_fragment_bytes", self.node)
+        proto.serialize = lambda msg, cid=None: dumps(msg, ensure_ascii=False).encode("utf-8")
+        message = {"op": "publish", "topic": "/test", "msg": {"data": "äöü" * 20}}
+        fragment_size = 7
+
+        fragments = list(Fragmentation(proto).fragment(message, fragment_size, "frag_id"))
+
+        self.assertGreater(len(fragments), 1)
+        for num, fragment in enumerate(fragments):
+            self.assertEqual("fragment", fragment["op"])
+            self.assertEqual("frag_id", fragment["id"])
+            self.assertEqual(num, fragment["num"])
+            self.assertIsInstance(fragment["data"], str)
+            self.assertLessEqual(len(fragment["data"]), fragment_size)
+            # fragments must stay serializable as ordinary JSON messages
+            dumps(fragment)
+        self.assertEqual(dumps(message, ensure_ascii=False), "".join(f["data"] for f in fragments))
+
+
+if __name__ == "__main__":
+    unittest.main()
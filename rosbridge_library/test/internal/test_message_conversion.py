@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import math
 import unittest
 from base64 import standard_b64encode
 from json import dumps, loads
@@ -7,6 +8,7 @@ import numpy as np
 from rclpy.serialization import deserialize_message, serialize_message
 from rosbridge_library.internal import message_conversion as c
 from rosbridge_library.internal import ros_loader
+from rosbridge_library.util import json as rosbridge_json
 
 
 class TestMessageConversion(unittest.TestCase):
@@ -238,6 +240,23 @@ class TestMessageConversion(unittest.TestCase):
             c.populate_instance(msg, inst2)
             self.assertEqual(inst, inst2)
 
+    def test_fixed_float64_array_serialization(self):
+        # rclpy holds fixed-size float64 arrays (e.g. covariances) as numpy arrays
+        inst = ros_loader.get_message_instance("sensor_msgs/Imu")
+        covariance = [0.5 * i for i in range(9)]
+        inst.orientation_covariance = covariance
+        msg = c.extract_values(inst)
+        result = loads(rosbridge_json.dumps(msg))
+        self.assertEqual(covariance, result["orientation_covariance"])
+        self.assertEqual([0.0] * 9, result["linear_acceleration_covariance"])
+
+    def test_float_special_cases_deserialization(self):
+        # clients commonly send NaN and Infinity literals, e.g. Python's json module
+        msg = rosbridge_json.loads('{"a": NaN, "b": Infinity, "c": -Infinity}')
+        self.assertTrue(math.isnan(msg["a"]))
+        self.assertEqual(float("inf"), msg["b"])
+        self.assertEqual(float("-inf"), msg["c"])
+
     def test_int8array(self):
         def test_int8_msg(rostype, data):
             msg = {"data": data}
@@ -182,6 +182,18 @@ class RosbridgeWebsocketNode(Node):
             "unregister_timeout", RosbridgeWebSocket.unregister_timeout
         ).value
 
+        RosbridgeWebSocket.message_batching = self.declare_parameter(
+            "message_batching", RosbridgeWebSocket.message_batching
+        ).value
+
+        RosbridgeWebSocket.batch_interval = self.declare_parameter(
+            "batch_interval", RosbridgeWebSocket.batch_interval
+        ).value
+
+        RosbridgeWebSocket.socket_buffer_size = self.declare_parameter(
+            "socket_buffer_size", RosbridgeWebSocket.socket_buffer_size
+        ).value
+
         bson_only_mode = self.declare_parameter("bson_only_mode", False).value
 
         RosbridgeWebSocket.client_manager = ClientManager(self)
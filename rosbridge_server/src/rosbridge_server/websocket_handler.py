@@ -30,19 +30,19 @@
 # ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import asyncio
+import socket
+import struct
 import sys
 import threading
 import traceback
 import uuid
-from collections import deque
-from functools import partial, wraps
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from typing import Any
 
-import rclpy
 from rosbridge_library.rosbridge_protocol import RosbridgeProtocol
 from rosbridge_library.util import bson, json
-from tornado import version_info as tornado_version_info
-from tornado.gen import BadYieldError, coroutine
 from tornado.ioloop import IOLoop
 from tornado.iostream import StreamClosedError
 from tornado.websocket import WebSocketClosedError, WebSocketHandler
@@ -62,6 +62,18 @@ def _log_exception():
 def log_exceptions(f):
     """Decorator for logging exceptions to ROS."""
 
+    if asyncio.iscoroutinefunction(f):
+
+        @wraps(f)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await f(*args, **kwargs)
+            except Exception:
+                _log_exception()
+                raise
+
+        return async_wrapper
+
     @wraps(f)
     def wrapper(*args, **kwargs):
         try:
@@ -73,54 +85,43 @@ def log_exceptions(f):
     return wrapper
 
 
-class IncomingQueue(threading.Thread):
-    """Decouples incoming messages from the Tornado thread.
+def _wrap_rclpy_future(rclpy_future):
+    """Return an asyncio future on the IOLoop that resolves with rclpy_future.
 
-    This mitigates cases where outgoing messages are blocked by incoming,
-    and vice versa.
+    Awaiting the result lets the IOLoop keep serving other clients, whereas
+    spinning until the rclpy future completes would block it.
     """
+    future = asyncio.get_running_loop().create_future()
 
-    def __init__(self, protocol):
-        threading.Thread.__init__(self)
-        self.daemon = True
-        self.queue = deque()
-        self.protocol = protocol
-
-        self.cond = threading.Condition()
-        self._finished = False
-
-    def finish(self):
-        """Clear the queue and do not accept further messages."""
-        with self.cond:
-            self._finished = True
-            while len(self.queue) > 0:
-                self.queue.popleft()
-            self.cond.notify()
-
-    def push(self, msg):
-        with self.cond:
-            self.queue.append(msg)
-            self.cond.notify()
-
-    def run(self):
-        while True:
-            with self.cond:
-                if len(self.queue) == 0 and not self._finished:
-                    self.cond.wait()
-
-                if self._finished:
-                    break
-
-                msg = self.queue.popleft()
-
-            self.protocol.incoming(msg)
+    def resolve(done):
+        if future.cancelled():
+            return
+        if done.cancelled():
+            future.set_exception(RuntimeError("service call was cancelled"))
+            return
+        exc = done.exception()
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(done.result())
 
-        self.protocol.finish()
+    rclpy_future.add_done_callback(lambda done: _io_loop.add_callback(resolve, done))
+    return future
 
 
 class RosbridgeWebSocket(WebSocketHandler):
     clients_connected = 0
     use_compression = False
+    # Shared by all handshakes, Tornado only reads it
+    _compression_options = {}
+
+    # Coalesce outgoing text messages into a single JSON array frame sent
+    # every batch_interval seconds. Clients must accept array frames.
+    message_batching = False
+    batch_interval = 0.002  # seconds
+
+    # Socket send/receive buffer size, 0 keeps the OS default (and autotuning)
+    socket_buffer_size = 0  # bytes
 
     # The following are passed on to RosbridgeProtocol
     # defragmentation.py:
@@ -161,18 +162,30 @@ class RosbridgeWebSocket(WebSocketHandler):
         }
         try:
             self.client_id = uuid.uuid4()
+            self._client_id_str = str(self.client_id)
+            self._remote_ip = self.request.remote_ip
             self.protocol = RosbridgeProtocol(
                 self.client_id, cls.node_handle, parameters=parameters
             )
-            self.incoming_queue = IncomingQueue(self.protocol)
-            self.incoming_queue.start()
+            # A single worker per client keeps messages in order and stops one
+            # client's blocking calls (e.g. call_service) from stalling others.
+            self._incoming_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="rosbridge_incoming"
+            )
+            self.incoming_queue = asyncio.Queue()
+            self._closed = False
+            self._drain_task = asyncio.ensure_future(self._drain_incoming())
             self.protocol.outgoing = self.send_message
             self.authenticated = False
             self.set_nodelay(True)
-            self._write_lock = threading.RLock()
+            self._tune_socket()
+            self._batch_lock = threading.Lock()
+            self._out_buffer = []
+            self._out_size = 0
+            self._flush_scheduled = False
             cls.clients_connected += 1
             if cls.client_manager:
-                cls.client_manager.add_client(self.client_id, self.request.remote_ip)
+                cls.client_manager.add_client(self.client_id, self._remote_ip)
         except Exception as exc:
             cls.node_handle.get_logger().error(
                 f"Unable to accept incoming connection.  Reason: {exc}"
@@ -182,69 +195,198 @@ class RosbridgeWebSocket(WebSocketHandler):
             f"Client connected. {cls.clients_connected} clients total."
         )
 
+    def _tune_socket(self):
+        """Apply the configured socket buffer size to the client socket."""
+        cls = self.__class__
+        if cls.socket_buffer_size <= 0:
+            return
+        sock = self.ws_connection.stream.socket
+        if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, cls.socket_buffer_size)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, cls.socket_buffer_size)
+        except OSError as exc:
+            cls.node_handle.get_logger().warn(f"Unable to set socket options: {exc}")
+
     @log_exceptions
     def on_message(self, message):
-        cls = self.__class__
         if isinstance(message, bytes):
+            # the protocol buffers partial messages as str, so binary frames must be decoded
             message = message.decode("utf-8")
-        if not message.strip():
-            return
-        msg = json.loads(message)
-        # check if we need to authenticate
-        failure = None
+        if not message or message.isspace():
+            return None
         if self.authenticated or self.authentication_service is None:
-            # no authentication required
-            if msg["op"] != "auth":
-                self.incoming_queue.push(message)
-        elif msg["op"] == "auth":
-            if self.check_authentication(message):
-                self.authenticated = True
-            else:
-                failure = "Authentication failed for client: %s" % (self.client_id)
+            # no authentication required, only parse if this might be an auth message
+            if '"auth"' in message:
+                try:
+                    op = json.loads(message)["op"]
+                except Exception:
+                    self._reject("Invalid message from client: %s" % self._client_id_str)
+                    return None
+                if op == "auth":
+                    return None
+            self.incoming_queue.put_nowait(message)
+            return None
+        # Tornado waits on the returned coroutine before reading the next message
+        return self._authenticate(message)
+
+    async def _authenticate(self, message):
+        """Handle a message from a client that has not authenticated yet.
+
+        Errors are handled here rather than raised, as Tornado does not close
+        the connection when the awaitable returned by on_message fails.
+        """
+        try:
+            # parse off the IOLoop so large messages do not stall other clients
+            msg = await IOLoop.current().run_in_executor(
+                self._incoming_executor, json.loads, message
+            )
+            op = msg["op"]
+        except Exception:
+            self._reject("Invalid message from client: %s" % self._client_id_str)
+            return
+        if op != "auth":
+            self._reject("Authentication required for client: %s" % self._client_id_str)
+            return
+        try:
+            authenticated = await self.check_authentication(msg)
+        except Exception:
+            # already logged by log_exceptions
+            authenticated = False
+        if authenticated:
+            self.authenticated = True
         else:
-            failure = "Authentication required for client: %s" % (self.client_id)
-        if failure is not None:
-            cls.node_handle.get_logger().warn(failure)
-            self.close()
+            self._reject("Authentication failed for client: %s" % self._client_id_str)
+
+    def _reject(self, reason):
+        """Log why a client is being dropped and close its connection."""
+        self.__class__.node_handle.get_logger().warn(reason)
+        self.close()
 
     @log_exceptions
     def on_close(self):
         cls = self.__class__
         cls.clients_connected -= 1
         if cls.client_manager:
-            cls.client_manager.remove_client(self.client_id, self.request.remote_ip)
+            cls.client_manager.remove_client(self.client_id, self._remote_ip)
         cls.node_handle.get_logger().info(
             f"Client disconnected. {cls.clients_connected} clients total."
         )
-        self.incoming_queue.finish()
+        self._closed = True
+        self._drain_task.cancel()
+
+    async def _drain_incoming(self):
+        """Pass queued client messages to the protocol, in order.
+
+        The protocol may block (e.g. on ROS calls), so messages are handled on
+        the client's own single-worker executor. This decouples incoming
+        messages from the Tornado thread. Bursts are drained together so the
+        executor hop is paid once per batch.
+        """
+        io_loop = IOLoop.current()
+        pending = None
+        try:
+            while True:
+                batch = [await self.incoming_queue.get()]
+                while not self.incoming_queue.empty():
+                    batch.append(self.incoming_queue.get_nowait())
+                pending = io_loop.run_in_executor(
+                    self._incoming_executor, self._handle_incoming, batch
+                )
+                await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            _log_exception()
+            # Nothing reads the queue any more, so drop the client
+            _io_loop.add_callback(self.close)
+        finally:
+            # Let an in-flight message finish before tearing down the protocol.
+            if pending is not None:
+                await asyncio.wait([pending])
+            await io_loop.run_in_executor(self._incoming_executor, self.protocol.finish)
+            self._incoming_executor.shutdown(wait=False)
+
+    def _handle_incoming(self, batch):
+        for message in batch:
+            # Stop after the message in flight once the client has disconnected.
+            if self._closed:
+                break
+            self.protocol.incoming(message)
 
     def send_message(self, message):
-        if isinstance(message, bson.BSON):
-            binary = True
-        elif isinstance(message, bytearray):
-            binary = True
-            message = bytes(message)
+        # Scheduling is thread-safe and writes run in order on the IOLoop
+        # thread, which is all the serialization they need.
+        if isinstance(message, (bson.BSON, bytearray)):
+            self._send_binary(message)
         else:
-            binary = False
+            self._send_text(message)
 
-        with self._write_lock:
-            _io_loop.add_callback(partial(self.prewrite_message, message, binary))
+    def _send_text(self, message):
+        # JSON may arrive as utf-8 bytes (see rosbridge_library.util); Tornado writes
+        # bytes as-is, so those are still sent as text frames without re-encoding.
+        cls = self.__class__
+        if not cls.message_batching:
+            _io_loop.add_callback(self._do_write, message, False)
+            return
+        # Batches are kept within the client's fragment size, so fragments of
+        # a large message are still sent as separate frames.
+        limit = self.protocol.fragment_size or cls.max_message_size
+        size = len(message) + 1  # including the separating comma
+        with self._batch_lock:
+            if self._out_size + size > limit:
+                self._write_batch()
+            self._out_buffer.append(message)
+            self._out_size += size
+            if self._out_size >= limit:
+                self._write_batch()
+                return
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        _io_loop.add_callback(_io_loop.call_later, cls.batch_interval, self._flush_out)
+
+    def _send_binary(self, message):
+        if self.__class__.message_batching:
+            # Keep ordering: anything already batched goes out first.
+            self._flush_out()
+        _io_loop.add_callback(self._do_write, message, True)
+
+    def _flush_out(self):
+        """Send all batched text messages as one frame."""
+        with self._batch_lock:
+            self._flush_scheduled = False
+            self._write_batch()
+
+    def _write_batch(self):
+        """Schedule the batched text messages as one frame, with _batch_lock held."""
+        if not self._out_buffer:
+            return
+        if len(self._out_buffer) == 1:
+            batch = self._out_buffer[0]
+        elif isinstance(self._out_buffer[0], bytes):
+            batch = b"[" + b",".join(self._out_buffer) + b"]"
+        else:
+            batch = "[" + ",".join(self._out_buffer) + "]"
+        self._out_buffer = []
+        self._out_size = 0
+        _io_loop.add_callback(self._do_write, batch, False)
 
-    @coroutine
-    def prewrite_message(self, message, binary):
+    async def _do_write(self, message, binary):
         cls = self.__class__
-        # Use a try block because the log decorator doesn't cooperate with @coroutine.
         try:
-            with self._write_lock:
+            if isinstance(message, bytearray):
+                future = self._write_binary_frame(message)
+            else:
                 future = self.write_message(message, binary)
 
-                # When closing, self.write_message() return None even if it's an undocument output.
-                # Consider it as WebSocketClosedError
-                # For tornado versions <4.3.0 self.write_message() does not have a return value
-                if future is None and tornado_version_info >= (4, 3, 0, 0):
-                    raise WebSocketClosedError
+            # When closing, self.write_message() return None even if it's an undocument output.
+            # Consider it as WebSocketClosedError
+            if future is None:
+                raise WebSocketClosedError
 
-                yield future
+            await future
         except WebSocketClosedError:
             cls.node_handle.get_logger().warn(
                 "WebSocketClosedError: Tried to write to a closed websocket",
@@ -257,52 +399,82 @@ class RosbridgeWebSocket(WebSocketHandler):
                 throttle_duration_sec=1.0,
             )
             raise
-        except BadYieldError:
-            # Tornado <4.5.0 doesn't like its own yield and raises BadYieldError.
-            # This does not affect functionality, so pass silently only in this case.
-            if tornado_version_info < (4, 5, 0, 0):
-                pass
-            else:
-                _log_exception()
-                raise
         except:  # noqa: E722  # Will log and raise
             _log_exception()
             raise
 
+    def _write_binary_frame(self, message):
+        """Write a bytearray as a binary frame without copying it.
+
+        write_message only accepts bytes and concatenates the frame header
+        with the payload, copying large messages twice. Uncompressed frames
+        are instead written as the (unmasked, single fragment) RFC 6455
+        header followed by a memoryview of the payload, which the IOStream
+        buffers without copying.
+        """
+        conn = self.ws_connection
+        # WebSocketProtocol.is_closing() is only available from Tornado 6
+        if conn is None or conn.server_terminated or conn.stream.closed():
+            raise WebSocketClosedError()
+        if self.get_compression_options() is not None:
+            # The payload may need deflating, leave framing to Tornado
+            return self.write_message(bytes(message), binary=True)
+
+        length = len(message)
+        if length < 126:
+            header = struct.pack("BB", 0x82, length)
+        elif length <= 0xFFFF:
+            header = struct.pack("!BBH", 0x82, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x82, 127, length)
+        conn.stream.write(header)
+        return conn.stream.write(memoryview(message))
+
     @log_exceptions
     def check_origin(self, origin):
         return True
 
     @log_exceptions
-    def check_authentication(self, message) -> bool:
+    async def check_authentication(self, msg: dict) -> bool:
         cls = self.__class__
-        msg = json.loads(message)
         if msg["op"] != "auth":
             return False
         authenticated = False
         # check the authorization information
         auth_req = Authentication.Request(
-            client_connection_id=str(self.client_id), remote_ip=self.request.remote_ip
+            client_connection_id=self._client_id_str, remote_ip=self._remote_ip
         )
         if "fields" in msg and isinstance(msg["fields"], dict):
             for k, v in msg["fields"].items():
                 auth_req.fields.append(AuthenticationField(name=k, value=v))
+        rclpy_future = None
         try:
-            auth_future = self.auth_client.call_async(auth_req)
-            rclpy.spin_until_future_complete(cls.node_handle, auth_future, timeout_sec=90.0)
+            rclpy_future = self.auth_client.call_async(auth_req)
+            auth_future = _wrap_rclpy_future(rclpy_future)
+            auth_response = await asyncio.wait_for(auth_future, timeout=90.0)
+        except asyncio.TimeoutError:
+            cls.node_handle.get_logger().error(
+                "Authentication service call timed out while waiting for response from %s"
+                % self.authentication_service
+            )
         except Exception as e:
             cls.node_handle.get_logger().error(
                 "Authentication service call to %s failed %r" % (self.authentication_service, e)
             )
         else:
-            if auth_future.done():
-                auth_response = auth_future.result()
+            if auth_response is not None:
                 authenticated = auth_response.authenticated
             else:
                 cls.node_handle.get_logger().error(
-                    "Authentication service call timed out while waiting for response from %s"
+                    "Authentication service call to %s returned no response"
                     % self.authentication_service
                 )
+        finally:
+            # Do not leave a timed out (or abandoned) request pending on auth_client
+            if rclpy_future is not None and not rclpy_future.done():
+                rclpy_future.cancel()
+                if hasattr(self.auth_client, "remove_pending_request"):
+                    self.auth_client.remove_pending_request(rclpy_future)
         return authenticated
 
     @log_exceptions
@@ -314,4 +486,4 @@ class RosbridgeWebSocket(WebSocketHandler):
         if not cls.use_compression:
             return None
 
-        return {}
+        return cls._compression_options
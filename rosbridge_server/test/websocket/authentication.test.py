@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+import os
+import sys
+import unittest
+
+from rclpy.node import Node
+from rclpy.task import Future
+from std_msgs.msg import String
+from twisted.python import log
+
+from rosbridge_msgs.srv import Authentication
+
+sys.path.append(os.path.dirname(__file__))  # enable importing from common.py in this directory
+
+import common  # noqa: E402
+from common import expect_messages, sleep, websocket_test  # noqa: E402
+
+log.startLogging(sys.stderr)
+
+AUTH_SERVICE = "/test_authenticate"
+
+
+def generate_test_description(ready_fn):
+    return common.generate_test_description(
+        ready_fn, parameters={"authentication_service": AUTH_SERVICE}
+    )
+
+
+class TestAuthentication(unittest.TestCase):
+    @websocket_test
+    async def test_authentication(self, node: Node, make_client):
+        TOPIC = "/a_topic"
+        WARMUP_DELAY = 1.0  # seconds
+
+        # Holds back the response for the "slow" client until it is released
+        release_slow = Future()
+        release_slow.add_done_callback(lambda _: node.executor.wake())
+
+        async def authenticate(req, res):
+            secret = {field.name: field.value for field in req.fields}.get("secret")
+            if secret == "slow":
+                await release_slow
+            res.authenticated = secret in ("good", "slow")
+            return res
+
+        service = node.create_service(Authentication, AUTH_SERVICE, authenticate)
+        pub = node.create_publisher(String, TOPIC, 1)
+
+        await sleep(node, WARMUP_DELAY)
+
+        subscribe = {"op": "subscribe", "topic": TOPIC, "type": "std_msgs/String"}
+
+        # The server does not read further messages until the auth call completes
+        slow_client = await make_client()
+        slow_future, slow_client.message_handler = expect_messages(
+            1, "slow WebSocket", node.get_logger()
+        )
+        slow_future.add_done_callback(lambda _: node.executor.wake())
+        slow_client.sendJson({"op": "auth", "fields": {"secret": "slow"}})
+        slow_client.sendJson(subscribe)
+
+        # Other clients are served while the slow client's auth call is pending
+        good_client = await make_client()
+        good_future, good_client.message_handler = expect_messages(
+            1, "good WebSocket", node.get_logger()
+        )
+        good_future.add_done_callback(lambda _: node.executor.wake())
+        good_client.sendJson({"op": "auth", "fields": {"secret": "good"}})
+        good_client.sendJson(subscribe)
+
+        await sleep(node, WARMUP_DELAY)
+        pub.publish(String(data="before"))
+
+        msgs = await good_future
+        self.assertEqual("before", msgs[0]["msg"]["data"])
+        self.assertFalse(slow_future.done())
+        self.assertFalse(slow_client.closed_future.done())
+
+        # Wrong credentials, and messages sent without authenticating, are rejected
+        bad_client = await make_client()
+        bad_client.closed_future.add_done_callback(lambda _: node.executor.wake())
+        bad_client.sendJson({"op": "auth", "fields": {"secret": "bad"}})
+
+        anonymous_client = await make_client()
+        anonymous_client.closed_future.add_done_callback(lambda _: node.executor.wake())
+        anonymous_client.sendJson(subscribe)
+
+        await bad_client.closed_future
+        await anonymous_client.closed_future
+
+        # Once its auth call completes, the slow client is served too
+        good_future, good_client.message_handler = expect_messages(
+            1, "good WebSocket", node.get_logger()
+        )
+        good_future.add_done_callback(lambda _: node.executor.wake())
+        release_slow.set_result(None)
+
+        await sleep(node, WARMUP_DELAY)
+        pub.publish(String(data="after"))
+
+        msgs = await slow_future
+        self.assertEqual("after", msgs[0]["msg"]["data"])
+        msgs = await good_future
+        self.assertEqual("after", msgs[0]["msg"]["data"])
+        self.assertFalse(slow_client.closed_future.done())
+        self.assertFalse(good_client.closed_future.done())
+
+        node.destroy_publisher(pub)
+        node.destroy_service(service)
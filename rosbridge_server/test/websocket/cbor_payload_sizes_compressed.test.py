@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+import os
+import sys
+import unittest
+
+from rclpy.node import Node
+from rosbridge_library.util.cbor import loads as decode_cbor
+from std_msgs.msg import String
+from twisted.python import log
+
+sys.path.append(os.path.dirname(__file__))  # enable importing from common.py in this directory
+
+import common  # noqa: E402
+from common import expect_messages, sleep, websocket_test  # noqa: E402
+
+log.startLogging(sys.stderr)
+
+
+def generate_test_description(ready_fn):
+    return common.generate_test_description(ready_fn, parameters={"use_compression": True})
+
+
+class TestCborPayloadSizesCompressed(unittest.TestCase):
+    @websocket_test
+    async def test_cbor_payload_sizes_compressed(self, node: Node, make_client):
+        ws_client = await make_client(compression=True)
+        # permessage-deflate must have been negotiated for this test to be meaningful
+        self.assertIsNotNone(ws_client._perMessageCompress)
+        TOPIC = "/a_topic"
+        # CBOR payloads needing a 7-bit, 16-bit and 64-bit websocket frame length
+        DATA_SIZES = [10, 1000, 100000]
+        WARMUP_DELAY = 1.0  # seconds
+
+        ws_completed_future, ws_client.message_handler = expect_messages(
+            len(DATA_SIZES), "WebSocket", node.get_logger()
+        )
+        ws_completed_future.add_done_callback(lambda _: node.executor.wake())
+
+        pub = node.create_publisher(String, TOPIC, len(DATA_SIZES))
+
+        ws_client.sendJson(
+            {"op": "subscribe", "topic": TOPIC, "type": "std_msgs/String", "compression": "cbor"}
+        )
+
+        await sleep(node, WARMUP_DELAY)
+
+        for size in DATA_SIZES:
+            pub.publish(String(data="A" * size))
+
+        payloads = await ws_completed_future
+
+        # Sizes are of the inflated payloads, the frames themselves are deflated
+        self.assertLess(len(payloads[0]), 126)
+        self.assertTrue(126 <= len(payloads[1]) <= 0xFFFF)
+        self.assertGreater(len(payloads[2]), 0xFFFF)
+        for size, payload in zip(DATA_SIZES, payloads):
+            self.assertIsInstance(payload, bytes)
+            msg = decode_cbor(payload)
+            self.assertEqual("publish", msg["op"])
+            self.assertEqual(TOPIC, msg["topic"])
+            self.assertEqual("A" * size, msg["msg"]["data"])
+
+        node.destroy_publisher(pub)
@@ -7,6 +7,11 @@ import launch_ros
 import rclpy
 import rclpy.task
 from autobahn.twisted.websocket import WebSocketClientFactory, WebSocketClientProtocol
+from autobahn.websocket.compress import (
+    PerMessageDeflateOffer,
+    PerMessageDeflateResponse,
+    PerMessageDeflateResponseAccept,
+)
 from rcl_interfaces.srv import GetParameters
 from rclpy.executors import SingleThreadedExecutor
 from rclpy.node import Node
@@ -24,12 +29,16 @@ class TestClientProtocol(WebSocketClientProtocol):
     def __init__(self, *args, **kwargs):
         self.received = []
         self.connected_future = rclpy.task.Future()
+        self.closed_future = rclpy.task.Future()
         self.message_handler = lambda _: None
         super().__init__(*args, **kwargs)
 
     def onOpen(self):
         self.connected_future.set_result(None)
 
+    def onClose(self, wasClean, code, reason):
+        self.closed_future.set_result(code)
+
     def sendJson(self, msg_dict, *, times=1):
         msg = json.dumps(msg_dict).encode("utf-8")
         for _ in range(times):
@@ -38,25 +47,27 @@ class TestClientProtocol(WebSocketClientProtocol):
 
     def onMessage(self, payload, binary):
         print(f"WebSocket client received message: {payload}")
-        self.message_handler(json.loads(payload))
+        self.message_handler(payload if binary else json.loads(payload))
 
 
-def generate_test_description(ready_fn) -> launch.LaunchDescription:
+def generate_test_description(ready_fn, parameters=None) -> launch.LaunchDescription:
     """
     Generate a launch description that runs the websocket server. Re-export this from a test file and use add_launch_test() to run the test.
+    Extra server parameters can be passed as a dict from a wrapping generate_test_description.
     """
+    parameters = {"port": 0, **(parameters or {})}
     try:
         node = launch_ros.actions.Node(
             executable="rosbridge_websocket",
             package="rosbridge_server",
-            parameters=[{"port": 0}],
+            parameters=[parameters],
         )
     except TypeError:
         # Deprecated keyword arg node_executable: https://github.com/ros2/launch_ros/pull/140
         node = launch_ros.actions.Node(
             node_executable="rosbridge_websocket",
             package="rosbridge_server",
-            parameters=[{"port": 0}],
+            parameters=[parameters],
         )
 
     return launch.LaunchDescription(
@@ -81,10 +92,18 @@ async def get_server_port(node: Node) -> int:
         node.destroy_client(client)
 
 
-async def connect_to_server(node: Node) -> TestClientProtocol:
+async def connect_to_server(node: Node, compression: bool = False) -> TestClientProtocol:
     port = await get_server_port(node)
     factory = WebSocketClientFactory("ws://127.0.0.1:" + str(port))
     factory.protocol = TestClientProtocol
+    if compression:
+        # Offer permessage-deflate, the server only enables it with use_compression
+        factory.setProtocolOptions(
+            perMessageCompressionOffers=[PerMessageDeflateOffer()],
+            perMessageCompressionAccept=lambda response: PerMessageDeflateResponseAccept(response)
+            if isinstance(response, PerMessageDeflateResponse)
+            else None,
+        )
 
     future = rclpy.task.Future()
     future.add_done_callback(lambda _: node.executor.wake())
@@ -113,7 +132,7 @@ def run_websocket_test(
     executor.add_node(node)
 
     async def task():
-        await test_fn(node, lambda: connect_to_server(node))
+        await test_fn(node, lambda **kwargs: connect_to_server(node, **kwargs))
         reactor.callFromThread(reactor.stop)
 
     future = executor.create_task(task)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+import os
+import sys
+import unittest
+
+from rclpy.node import Node
+from rclpy.qos import DurabilityPolicy, QoSProfile
+from std_msgs.msg import Int32
+from twisted.python import log
+
+sys.path.append(os.path.dirname(__file__))  # enable importing from common.py in this directory
+
+import common  # noqa: E402
+from common import sleep, websocket_test  # noqa: E402
+
+log.startLogging(sys.stderr)
+
+generate_test_description = common.generate_test_description
+
+
+class TestMalformedMessage(unittest.TestCase):
+    @websocket_test
+    async def test_malformed_message(self, node: Node, make_client):
+        WARMUP_DELAY = 1.0  # seconds
+
+        client_counts = []
+        sub = node.create_subscription(
+            Int32,
+            "/client_count",
+            lambda msg: client_counts.append(msg.data),
+            QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL),
+        )
+
+        await sleep(node, WARMUP_DELAY)
+
+        ws_client = await make_client()
+        ws_client.closed_future.add_done_callback(lambda _: node.executor.wake())
+
+        # Looks like it could be an auth message, but has no op
+        ws_client.sendJson({"auth": True})
+
+        await ws_client.closed_future
+        await sleep(node, WARMUP_DELAY)
+
+        # The server closed the connection and cleaned up after the client
+        self.assertIn(1, client_counts)
+        self.assertEqual(0, client_counts[-1])
+
+        node.destroy_subscription(sub)
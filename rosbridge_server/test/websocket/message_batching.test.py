@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+import json
+import os
+import sys
+import unittest
+
+from rclpy.node import Node
+from rosbridge_library.util.cbor import loads as decode_cbor
+from std_msgs.msg import String
+from twisted.python import log
+
+sys.path.append(os.path.dirname(__file__))  # enable importing from common.py in this directory
+
+import common  # noqa: E402
+from common import expect_messages, sleep, websocket_test  # noqa: E402
+
+log.startLogging(sys.stderr)
+
+# Long enough that the text messages are still batched when the binary one is sent
+BATCH_INTERVAL = 1.0  # seconds
+# Small enough that a large message is fragmented, large enough for the batch of text messages
+MAX_MESSAGE_SIZE = 1000  # bytes
+
+
+def generate_test_description(ready_fn):
+    return common.generate_test_description(
+        ready_fn,
+        parameters={
+            "message_batching": True,
+            "batch_interval": BATCH_INTERVAL,
+            "max_message_size": MAX_MESSAGE_SIZE,
+        },
+    )
+
+
+class TestMessageBatching(unittest.TestCase):
+    @websocket_test
+    async def test_message_batching(self, node: Node, make_client):
+        ws_client = await make_client()
+        NUM_MSGS = 5
+        A_TOPIC = "/a_topic"
+        B_TOPIC = "/b_topic"
+        C_TOPIC = "/c_topic"
+        # Fragmented into 3 parts of MAX_MESSAGE_SIZE
+        LARGE_DATA = "A" * (2 * MAX_MESSAGE_SIZE + MAX_MESSAGE_SIZE // 2)
+        WARMUP_DELAY = 1.0  # seconds
+
+        ws_completed_future, ws_client.message_handler = expect_messages(
+            2, "WebSocket", node.get_logger()
+        )
+        ws_completed_future.add_done_callback(lambda _: node.executor.wake())
+
+        pub_a = node.create_publisher(String, A_TOPIC, NUM_MSGS)
+        pub_b = node.create_publisher(String, B_TOPIC, 1)
+        pub_c = node.create_publisher(String, C_TOPIC, 1)
+
+        ws_client.sendJson({"op": "subscribe", "topic": A_TOPIC, "type": "std_msgs/String"})
+        ws_client.sendJson(
+            {
+                "op": "subscribe",
+                "topic": B_TOPIC,
+                "type": "std_msgs/String",
+                "compression": "cbor",
+            }
+        )
+        ws_client.sendJson({"op": "subscribe", "topic": C_TOPIC, "type": "std_msgs/String"})
+
+        await sleep(node, WARMUP_DELAY)
+
+        for i in range(NUM_MSGS):
+            pub_a.publish(String(data=str(i)))
+        await sleep(node, BATCH_INTERVAL / 4)
+        pub_b.publish(String(data="binary"))
+
+        batch, binary = await ws_completed_future
+
+        # The batched text messages arrive as one array frame, flushed before the binary frame
+        self.assertIsInstance(batch, list)
+        self.assertEqual(NUM_MSGS, len(batch))
+        for i, msg in enumerate(batch):
+            self.assertEqual("publish", msg["op"])
+            self.assertEqual(A_TOPIC, msg["topic"])
+            self.assertEqual(str(i), msg["msg"]["data"])
+
+        self.assertIsInstance(binary, bytes)
+        msg = decode_cbor(binary)
+        self.assertEqual(B_TOPIC, msg["topic"])
+        self.assertEqual("binary", msg["msg"]["data"])
+
+        # Fragments of a large message are not batched together
+        ws_completed_future, ws_client.message_handler = expect_messages(
+            3, "WebSocket", node.get_logger()
+        )
+        ws_completed_future.add_done_callback(lambda _: node.executor.wake())
+
+        pub_c.publish(String(data=LARGE_DATA))
+
+        fragments = await ws_completed_future
+
+        for i, fragment in enumerate(fragments):
+            self.assertIsInstance(fragment, dict)
+            self.assertEqual("fragment", fragment["op"])
+            self.assertEqual(i, fragment["num"])
+        msg = json.loads("".join(fragment["data"] for fragment in fragments))
+        self.assertEqual(C_TOPIC, msg["topic"])
+        self.assertEqual(LARGE_DATA, msg["msg"]["data"])
+
+        node.destroy_publisher(pub_a)
+        node.destroy_publisher(pub_b)
+        node.destroy_publisher(pub_c)